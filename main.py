@@ -1,32 +1,102 @@
+import argparse
 import os
-import pandas as pd
-from src.scraper import get_suumo_data, save_csv
-from src.cleaner import clean_suumo_data
-from src.station_info import get_unique_stations, create_station_time_mapping
-from src.analyzer import merge_times_to_main_df
+import tomllib
 
-def process_suumo_pipeline(url, name, end_page, start_page=1):
+# 重いライブラリ (pandas, requests, bs4, retry など) は各ステージ関数の中で import し、
+# サブコマンドごとに必要なものだけを読み込む
+
+DEFAULT_CONFIG = "tasks.toml"
+DEFAULT_DATA_DIR = "data"
+
+# 最終CSVのカラム順
+COLUMN_ORDER = [
+    'building_name', 'category', 'address', 'layout', 'area', 'floor', 'stories', 'age',
+    'rent', 'admin_fee', 'deposit', 'gratuity',
+    'access_1_line', 'access_1_station', 'access_1_walk_min', 'access_1_time_min', 'access_1_transfer_count',
+    'access_2_line', 'access_2_station', 'access_2_walk_min', 'access_2_time_min', 'access_2_transfer_count',
+    'access_3_line', 'access_3_station', 'access_3_walk_min', 'access_3_time_min', 'access_3_transfer_count',
+    'url', 'acquired_at'
+]
+
+def load_tasks(config_path, names=None, require_url=False):
     """
-    1. スクレイピング (Raw CSV保存)
-    2. クリーニング (路線/駅分割、数値化)
-    3. 駅名抽出 & 電車所要時間取得 (Times CSV保存)
-    4. マージ & 最終クリーンCSV保存
+    設定ファイル(TOML)からタスク一覧を読み込む。names が指定された場合はその名前のタスクのみ返す。
+    require_url が True の場合、url のないタスクはエラーにする (スクレイピングを行うコマンド用)。
     """
-    os.makedirs("data", exist_ok=True)
+    with open(config_path, "rb") as f:
+        config = tomllib.load(f)
 
-    # --- 1. スクレイピング ---
-    print(f"\n--- Starting: {name} ---")
-    data_samples = get_suumo_data(url, end_page, start_page)
-    raw_csv_path = save_csv(data_samples, "data", f"{name}_suumo")
+    default_end_page = config.get("end_page", 10)
+    tasks = []
+    for task in config.get("tasks", []):
+        if not task.get("name"):
+            raise SystemExit(f"Task without name in {config_path}")
+        tasks.append({
+            "name": task["name"],
+            "url": task.get("url"),
+            "end_page": task.get("end_page", default_end_page),
+            "start_page": task.get("start_page", 1),
+        })
+
+    # 同名タスクは同じCSVを上書きし合うため許可しない
+    all_names = [t["name"] for t in tasks]
+    duplicates = sorted({n for n in all_names if all_names.count(n) > 1})
+    if duplicates:
+        raise SystemExit(f"Duplicate task name(s) in {config_path}: {', '.join(duplicates)}")
+
+    if names:
+        unknown = [n for n in names if n not in all_names]
+        if unknown:
+            raise SystemExit(f"Unknown task(s) in {config_path}: {', '.join(unknown)}")
+        tasks = [t for t in tasks if t["name"] in names]
+
+    if require_url:
+        missing_url = [t["name"] for t in tasks if not t["url"]]
+        if missing_url:
+            raise SystemExit(f"Task(s) without url in {config_path}: {', '.join(missing_url)}")
+
+    return tasks
+
+# --- 各ステージ ---
+# 入出力ファイル:
+#   scrape   -> {data_dir}/{name}_suumo.csv   (生データ)
+#   clean    -> {data_dir}/{name}_clean.csv   (路線/駅分割、数値化済み)
+#   stations -> {data_dir}/{name}_station.csv (駅ごとの所要時間)
+#   merge    -> {data_dir}/{name}.csv         (最終成果物)
+#   analyze  -> {data_dir}/{name}_ranking.csv (コスパ駅ランキング)
+
+def scrape_stage(task, data_dir=DEFAULT_DATA_DIR):
+    """1. スクレイピング (Raw CSV保存)"""
+    from src.scraper import get_suumo_data, save_csv
+
+    os.makedirs(data_dir, exist_ok=True)
+    data_samples = get_suumo_data(task["url"], task["end_page"], task["start_page"])
+    raw_csv_path = save_csv(data_samples, data_dir, f"{task['name']}_suumo")
     print(f"Raw data saved to: {raw_csv_path}")
+    return raw_csv_path
+
+def clean_stage(task, data_dir=DEFAULT_DATA_DIR):
+    """2. クリーニング (路線/駅分割、数値化)"""
+    import pandas as pd
+    from src.cleaner import clean_suumo_data
 
-    # --- 2. クリーニング ---
     print(f"Cleaning data and splitting lines/stations...")
-    df_raw = pd.read_csv(raw_csv_path)
+    df_raw = pd.read_csv(os.path.join(data_dir, f"{task['name']}_suumo.csv"))
     df_clean = clean_suumo_data(df_raw)
 
-    # --- 3. 駅情報の取得 (所要時間) ---
-    station_times_path = f"data/{name}_station.csv"
+    clean_csv_path = os.path.join(data_dir, f"{task['name']}_clean.csv")
+    df_clean.to_csv(clean_csv_path, index=False, encoding="utf-8-sig")
+    print(f"Cleaned data saved to: {clean_csv_path}")
+    return clean_csv_path
+
+def stations_stage(task, data_dir=DEFAULT_DATA_DIR):
+    """3. 駅名抽出 & 電車所要時間取得 (Times CSV保存)"""
+    import pandas as pd
+    from src.station_info import get_unique_stations, create_station_time_mapping
+
+    df_clean = pd.read_csv(os.path.join(data_dir, f"{task['name']}_clean.csv"))
+
+    station_times_path = os.path.join(data_dir, f"{task['name']}_station.csv")
     if os.path.exists(station_times_path):
         print(f"Loading existing station times from {station_times_path}")
         df_times = pd.read_csv(station_times_path)
@@ -34,7 +104,7 @@ def process_suumo_pipeline(url, name, end_page, start_page=1):
         df_times = pd.DataFrame(columns=['station_name', 'time_to_target_min', 'transfer_count'])
 
     unique_stations = get_unique_stations(df_clean)
-    
+
     # 既存のCSVにない駅のみ取得
     existing_stations = set(df_times['station_name'].dropna().unique())
     new_stations = [s for s in unique_stations if s not in existing_stations]
@@ -44,90 +114,109 @@ def process_suumo_pipeline(url, name, end_page, start_page=1):
         df_new_times = create_station_time_mapping(new_stations)
         # 結合して保存
         df_times = pd.concat([df_times, df_new_times], ignore_index=True).drop_duplicates(subset=['station_name'])
-        df_times.to_csv(station_times_path, index=False, encoding="utf-8-sig")
-        print(f"Updated station times saved to: {station_times_path}")
     else:
         print("All stations already exist in the master list.")
 
-    # --- 4. マージ & 最終保存 ---
+    # merge ステージの入力になるため、駅が0件でも必ず保存する
+    df_times.to_csv(station_times_path, index=False, encoding="utf-8-sig")
+    print(f"Station times saved to: {station_times_path}")
+    return station_times_path
+
+def merge_stage(task, data_dir=DEFAULT_DATA_DIR):
+    """4. マージ & 最終クリーンCSV保存"""
+    import pandas as pd
+    from src.analyzer import merge_times_to_main_df
+
     print("Merging transit times into cleaned data...")
+    df_clean = pd.read_csv(os.path.join(data_dir, f"{task['name']}_clean.csv"))
+    df_times = pd.read_csv(os.path.join(data_dir, f"{task['name']}_station.csv"))
     df_final = merge_times_to_main_df(df_clean, df_times)
-    
-    # カラムをご指定の順番に並び替え
-    column_order = [
-        'building_name', 'category', 'address', 'layout', 'area', 'floor', 'stories', 'age', 
-        'rent', 'admin_fee', 'deposit', 'gratuity',
-        'access_1_line', 'access_1_station', 'access_1_walk_min', 'access_1_time_min', 'access_1_transfer_count',
-        'access_2_line', 'access_2_station', 'access_2_walk_min', 'access_2_time_min', 'access_2_transfer_count',
-        'access_3_line', 'access_3_station', 'access_3_walk_min', 'access_3_time_min', 'access_3_transfer_count',
-        'url', 'acquired_at'
-    ]
-    
+
     # 存在するカラムのみで並び替え（エラー防止）
-    df_final = df_final[[col for col in column_order if col in df_final.columns]]
-    
-    final_csv_path = f"data/{name}.csv"
+    df_final = df_final[[col for col in COLUMN_ORDER if col in df_final.columns]]
+
+    final_csv_path = os.path.join(data_dir, f"{task['name']}.csv")
     df_final.to_csv(final_csv_path, index=False, encoding="utf-8-sig")
     print(f"Done! Final cleaned CSV: {final_csv_path}")
+    return final_csv_path
+
+def analyze_stage(task, data_dir=DEFAULT_DATA_DIR, min_properties=10, top_n=20):
+    """5. 駅ごとの家賃サマリー作成 & コスパ駅ランキング保存"""
+    import pandas as pd
+    from src.analyzer import create_station_rent_summary, calculate_cost_performance
+
+    df = pd.read_csv(os.path.join(data_dir, f"{task['name']}.csv"))
+    df_summary = create_station_rent_summary(df)
+    df_ranking = calculate_cost_performance(df_summary, min_properties=min_properties)
+
+    ranking_csv_path = os.path.join(data_dir, f"{task['name']}_ranking.csv")
+    df_ranking.to_csv(ranking_csv_path, index=False, encoding="utf-8-sig")
+
+    if df_ranking.empty:
+        print(f"No station has at least {min_properties} properties.")
+    else:
+        print(df_ranking[['station_name', 'time_to_tokyo_min', 'mean_rent_man', 'bargain_man', 'property_count']].head(top_n).to_string())
+    print(f"Ranking saved to: {ranking_csv_path}")
+    return ranking_csv_path
+
+def process_suumo_pipeline(url, name, end_page, start_page=1, data_dir=DEFAULT_DATA_DIR):
+    """
+    1. スクレイピング (Raw CSV保存)
+    2. クリーニング (路線/駅分割、数値化)
+    3. 駅名抽出 & 電車所要時間取得 (Times CSV保存)
+    4. マージ & 最終クリーンCSV保存
+    """
+    task = {"name": name, "url": url, "end_page": end_page, "start_page": start_page}
+
+    print(f"\n--- Starting: {name} ---")
+    scrape_stage(task, data_dir)
+    clean_stage(task, data_dir)
+    stations_stage(task, data_dir)
+    merge_stage(task, data_dir)
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-c", "--config", default=DEFAULT_CONFIG, help=f"タスク設定ファイル (default: {DEFAULT_CONFIG})")
+    common.add_argument("-t", "--task", action="append", dest="tasks", metavar="NAME", help="実行するタスク名 (複数指定可、省略時は全タスク)")
+    common.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help=f"CSVの入出力先 (default: {DEFAULT_DATA_DIR})")
+
+    parser = argparse.ArgumentParser(description="SUUMO 物件データの収集・整形・分析")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("all", parents=[common], help="scrape → clean → stations → merge を順に実行 (デフォルト)")
+    subparsers.add_parser("scrape", parents=[common], help="SUUMOから物件データを取得して生CSVを保存")
+    subparsers.add_parser("clean", parents=[common], help="生CSVを分析用に整形")
+    subparsers.add_parser("stations", parents=[common], help="駅ごとの所要時間を取得 (未取得の駅のみ)")
+    subparsers.add_parser("merge", parents=[common], help="所要時間をマージして最終CSVを保存")
+    analyze = subparsers.add_parser("analyze", parents=[common], help="最終CSVからコスパ駅ランキングを作成")
+    analyze.add_argument("--min-properties", type=int, default=10, help="集計対象とする駅の最小物件数 (default: 10)")
+    analyze.add_argument("--top", type=int, default=20, help="表示する上位件数 (default: 20)")
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        # 引数なしの場合は従来通り全ステージを実行
+        args = parser.parse_args(["all", *(argv or [])])
 
-def main():
-    end_page = 10
-    # 取得したいURLと名前のリスト
-    tasks = [
-        {
-            "name": "tokyo_all",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_rebar",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&kz=1&et=9999999&mt=9999999&mb=0&cn=9999999&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_steel",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&kz=1&et=9999999&mt=9999999&mb=0&cn=9999999&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_wooden",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&kz=3&et=9999999&mt=9999999&mb=0&cn=9999999&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_indoor_washing_machine",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&tc=0400501&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_separate_washroom",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&tc=0400502&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_soundproof",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&tc=0400506&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_separate_bath_and_toilet",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&tc=0400301&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_washlet",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&tc=0400302&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-        {
-            "name": "tokyo_bathroom_Dryer",
-            "url": "https://suumo.jp/jj/chintai/ichiran/FR301FC001/?ar=030&ta=13&bs=040&ekInput=25620&tj=90&nk=-1&ct=9999999&cb=0.0&et=9999999&mt=9999999&mb=0&cn=9999999&tc=0400303&shkr1=03&shkr2=03&shkr3=03&shkr4=03&fw2=&pc=30&page={}",
-            "end_page": end_page
-        },
-    ]
+    tasks = load_tasks(args.config, args.tasks, require_url=args.command in ("all", "scrape"))
 
     for task in tasks:
-        process_suumo_pipeline(task["url"], task["name"], task["end_page"])
+        if args.command == "all":
+            process_suumo_pipeline(task["url"], task["name"], task["end_page"], task["start_page"], args.data_dir)
+        elif args.command == "scrape":
+            scrape_stage(task, args.data_dir)
+        elif args.command == "clean":
+            clean_stage(task, args.data_dir)
+        elif args.command == "stations":
+            stations_stage(task, args.data_dir)
+        elif args.command == "merge":
+            merge_stage(task, args.data_dir)
+        elif args.command == "analyze":
+            print(f"\n--- Analyzing: {task['name']} ---")
+            analyze_stage(task, args.data_dir, args.min_properties, args.top)
 
 if __name__ == "__main__":
     main()